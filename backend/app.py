@@ -1,13 +1,26 @@
 from __future__ import annotations
 
 from pathlib import Path
-import io
+import os
 import re
 import sqlite3
+import tempfile
+import threading
 from typing import Any
 
 import pandas as pd
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson 未導入なら Flask 標準の json で返す
+    orjson = None
+
+# CSVはチャンク単位で読みながらDBへ書き込む（1チャンク分だけをメモリに載せる）。
+# pyarrowエンジンは chunksize 非対応なので Cエンジン（mmap）で読む。
+CSV_CHUNKSIZE = 10_000
+CSV_READ_OPTIONS: dict[str, Any] = {"dtype": str, "memory_map": True}
 
 
 # -----------------------------
@@ -18,30 +31,95 @@ DB_PATH = BASE_DIR / "surgDB.db"
 
 app = Flask(__name__, static_folder=str(BASE_DIR), static_url_path="")
 
+# 静的ファイルはブラウザに1時間キャッシュさせる（Cache-Control: public, max-age=3600。期限後は ETag / Last-Modified で再検証）
+# static_folder の組み込みルートが /<path> を先に拾うので、その既定値も合わせておく。
+# 本番では BASE_DIR を nginx などの location / の root にして静的ファイルはそちらで配信し、
+# Flask には /api/ だけを回す想定（ここは開発用の配信）
+STATIC_MAX_AGE = 3600
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = STATIC_MAX_AGE
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    # jsonify / app.json.dumps を orjson（C実装）で処理する
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+if orjson is not None:
+    app.json = ORJSONProvider(app)
+
 
 # -----------------------------
 # Static pages
 # -----------------------------
 @app.get("/")
 def index():
-    return send_from_directory(BASE_DIR, "index.html")
+    return send_from_directory(BASE_DIR, "index.html", max_age=STATIC_MAX_AGE)
 
 
 @app.get("/<path:filename>")
 def static_files(filename: str):
     # index.html / cases.html / case-usages.html / app.js / styles.css など全部ここで配信
-    return send_from_directory(BASE_DIR, filename)
+    return send_from_directory(BASE_DIR, filename, max_age=STATIC_MAX_AGE)
 
 
 # -----------------------------
 # DB helpers
 # -----------------------------
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+_local = threading.local()
+
+
+def open_conn(isolation_level: str | None = "") -> sqlite3.Connection:
+    # 新しい接続を開く（WALにしておくと書き込み中も読み取りがブロックされない）
+    # isolation_level=None にすると sqlite3 モジュールの暗黙の BEGIN を使わず、トランザクションは自分で張る
+    conn = sqlite3.connect(DB_PATH, isolation_level=isolation_level)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
     return conn
 
 
+def get_conn() -> sqlite3.Connection:
+    """
+    スレッドごとに1本の接続を使い回す（リクエストごとの connect を避ける）。
+    閉じずに返すので、呼び出し側で close() しないこと。
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = open_conn()
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    return conn
+
+
+@app.teardown_appcontext
+def _rollback_conn(exc: BaseException | None) -> None:
+    # 使い回す接続に未確定のトランザクションを残さない
+    conn = getattr(_local, "conn", None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def apply_import_pragmas(conn: sqlite3.Connection) -> None:
+    """
+    CSV一括インポート用の接続だけに適用する速度優先の設定。
+    synchronous=OFF のため、インポート中にOSクラッシュや電源断が起きると
+    直前のコミットが失われる可能性がある（アプリ例外時の ROLLBACK は従来どおり効く）。
+    CSVを再インポートすれば復旧できる前提で、インポートは open_conn() の専用接続で行い、
+    終わったら閉じて get_conn() の使い回し接続には持ち込まない。
+    journal_mode は WAL のまま（WAL中は他の接続があると切り替えられないため）。
+    """
+    conn.executescript(
+        """
+        PRAGMA synchronous=OFF;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-65536;
+        """
+    )
+
+
 def ensure_schema() -> None:
     """
     既存DBを壊さずに、CSVの「症例ID」を保持する ext_case_id を surg_cases に追加する。
@@ -49,32 +127,37 @@ def ensure_schema() -> None:
     - surg_cases.ext_case_id は外部ID（CSVの症例ID）
     """
     conn = get_conn()
-    try:
-        cur = conn.cursor()
+    cur = conn.cursor()
 
-        # テーブル存在チェック
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='surg_cases'")
-        if cur.fetchone() is None:
-            raise RuntimeError("DBに surg_cases テーブルが見つかりません（surgDB.db を確認してください）")
+    # テーブル存在チェック
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='surg_cases'")
+    if cur.fetchone() is None:
+        raise RuntimeError("DBに surg_cases テーブルが見つかりません（surgDB.db を確認してください）")
 
-        # 列チェック
-        cur.execute("PRAGMA table_info(surg_cases)")
-        cols = [r["name"] for r in cur.fetchall()]
+    # 列チェック
+    cur.execute("PRAGMA table_info(surg_cases)")
+    cols = [r["name"] for r in cur.fetchall()]
 
-        if "ext_case_id" not in cols:
-            cur.execute("ALTER TABLE surg_cases ADD COLUMN ext_case_id TEXT")
-            # UPSERT用に一意制約相当のIndexを追加（NULLは重複OK）
-            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_surg_cases_ext_case_id ON surg_cases(ext_case_id)")
+    if "ext_case_id" not in cols:
+        cur.execute("ALTER TABLE surg_cases ADD COLUMN ext_case_id TEXT")
 
-        conn.commit()
-    finally:
-        conn.close()
+    # ON CONFLICT(ext_case_id) 用に一意制約相当のIndexを保証（NULLは重複OK）
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_surg_cases_ext_case_id ON surg_cases(ext_case_id)")
+
+    # /api/cases の ORDER BY と同じ並びのIndex（全件ソートを避けてIndex順に読む）
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_surg_cases_sort'")
+    if cur.fetchone() is None:
+        cur.execute("CREATE INDEX idx_surg_cases_sort ON surg_cases(surg_date DESC, patient_id ASC)")
+        cur.execute("ANALYZE surg_cases")
+
+    # case_usage は case_id 単位で取得・削除するので索引を張る
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_case_usage_case_id ON case_usage(case_id)")
+
+    conn.commit()
 
 
-@app.before_request
-def _ensure_schema_once():
-    # 初回アクセス時にschemaを整える（本番なら起動時1回でもOK）
-    ensure_schema()
+# 起動時に1回だけschemaを整える（リクエストごとには実行しない）
+ensure_schema()
 
 
 # -----------------------------
@@ -93,9 +176,13 @@ REQUIRED_COLUMNS = [
 ]
 
 
+def normalize_columns(columns: pd.Index) -> pd.Index:
+    # 全角空白→半角、前後空白除去（列名まとめて処理）
+    return columns.astype(str).str.replace("\u3000", " ", regex=False).str.strip()
+
+
 def normalize_headers(df: pd.DataFrame) -> pd.DataFrame:
-    # 全角空白→半角、前後空白除去
-    df.columns = [str(c).replace("\u3000", " ").strip() for c in df.columns]
+    df.columns = normalize_columns(df.columns)
     return df
 
 
@@ -105,26 +192,68 @@ def validate_headers(df: pd.DataFrame) -> None:
         raise ValueError("必須列が不足しています: " + ", ".join(missing))
 
 
-def to_iso_date(val: Any) -> str | None:
-    if pd.isna(val):
-        return None
-    s = str(val).strip()
-    if not s:
-        return None
-    dt = pd.to_datetime(s, errors="coerce")
-    if pd.isna(dt):
-        raise ValueError(f"手術実施日の形式が不正です: {s}")
-    return dt.strftime("%Y-%m-%d")
+def save_upload_to_tempfile(f) -> str:
+    # アップロードをメモリに読み込まず一時ファイルへ書き出す（削除は呼び出し側）
+    fd, tmp_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    f.save(tmp_path)
+    return tmp_path
+
+
+def open_required_csv(path: str):
+    """
+    CSVファイル（Shift_JIS系 / cp932）を REQUIRED_COLUMNS の列だけ CSV_CHUNKSIZE 行ずつ読むリーダーを返す。
+    先にヘッダー行だけ読んで正規化後の列名で検証し、対応する元の列名を usecols に渡す。
+    ファイルから直接デコードしながら読むので、bytes / str の全文コピーは作らない。
+    各チャンクの列名は未正規化なので、呼び出し側で normalize_headers を通すこと。
+    """
+    header = pd.read_csv(path, encoding="cp932", dtype=str, nrows=0)
+    original_columns = header.columns
+    validate_headers(normalize_headers(header))
+
+    usecols = original_columns[header.columns.isin(REQUIRED_COLUMNS)].tolist()
+    return pd.read_csv(
+        path,
+        encoding="cp932",
+        usecols=usecols,
+        chunksize=CSV_CHUNKSIZE,
+        **CSV_READ_OPTIONS,
+    )
+
+
+def to_iso_date_series(s: pd.Series) -> pd.Series:
+    """
+    手術実施日を列まとめて YYYY-MM-DD に変換する（空欄は None）。
+    まず列全体で一括パースし、書式が混在していて取りこぼしたセルだけ1件ずつ再パースする。
+    解釈できない値があれば一覧にして ValueError を1回だけ出す。
+    """
+    text = s.fillna("").astype(str).str.strip()
+    filled = text.ne("")
+
+    dt = pd.to_datetime(text.where(filled), errors="coerce")
+
+    retry = dt.isna() & filled
+    if retry.any():
+        dt = dt.astype(object)
+        dt[retry] = text[retry].map(lambda v: pd.to_datetime(v, errors="coerce"))
+        dt = pd.to_datetime(dt)
+
+    bad = text[dt.isna() & filled]
+    if len(bad):
+        raise ValueError("手術実施日の形式が不正です: " + ", ".join(bad.unique()))
+
+    return dt.dt.strftime("%Y-%m-%d").astype(object).where(dt.notna(), None)
+
 
+# 数字列抽出用の正規表現（呼び出しごとのコンパイルを避けて1回だけ作る）
+_INT_RE = re.compile(r"(\d+)")
 
-def parse_int_safe(val: Any) -> int | None:
-    if pd.isna(val):
-        return None
-    s = str(val).strip()
-    if s == "":
-        return None
-    m = re.search(r"\d+", s)
-    return int(m.group()) if m else None
+
+def parse_int_series(s: pd.Series) -> pd.Series:
+    # 各セルの最初の数字列を整数化（数字がなければ <NA>）
+    # \d は全角数字にもマッチするので int() で変換する（"３０歳" → 30。to_numeric は全角を受け付けない）
+    digits = s.fillna("").astype(str).str.extract(_INT_RE, expand=False).dropna()
+    return digits.map(int).astype("Int64").reindex(s.index)
 
 
 # -----------------------------
@@ -132,15 +261,15 @@ def parse_int_safe(val: Any) -> int | None:
 # -----------------------------
 def build_surg_cases(df: pd.DataFrame) -> pd.DataFrame:
     out = pd.DataFrame()
-    out["ext_case_id"] = df["症例ID"].astype(str).str.strip()
-    out["patient_id"] = df["患者番号"].apply(parse_int_safe)
-    out["patient_name"] = df["患者氏名(漢字)"].astype(str).str.strip()
-    out["surg_date"] = df["手術実施日"].apply(to_iso_date)
-    out["age"] = df["年齢"].apply(parse_int_safe)
-    out["dept"] = df["実施診療科"].astype(str).str.strip()
-    out["surg_procedure"] = df["確定術式フリー検索"].astype(str).str.strip()
-    out["disease"] = df["術後病名"].astype(str).str.strip()
-    out["remarks"] = df["リマークス（看護）"].astype(str).fillna("").str.strip()
+    out["ext_case_id"] = df["症例ID"].fillna("").astype(str).str.strip()
+    out["patient_id"] = parse_int_series(df["患者番号"])
+    out["patient_name"] = df["患者氏名(漢字)"].fillna("").astype(str).str.strip()
+    out["surg_date"] = to_iso_date_series(df["手術実施日"])
+    out["age"] = parse_int_series(df["年齢"])
+    out["dept"] = df["実施診療科"].fillna("").astype(str).str.strip()
+    out["surg_procedure"] = df["確定術式フリー検索"].fillna("").astype(str).str.strip()
+    out["disease"] = df["術後病名"].fillna("").astype(str).str.strip()
+    out["remarks"] = df["リマークス（看護）"].fillna("").astype(str).str.strip()
 
     # 空のext_case_id除外
     out = out[out["ext_case_id"] != ""].copy()
@@ -153,6 +282,13 @@ def build_surg_cases(df: pd.DataFrame) -> pd.DataFrame:
 # -----------------------------
 # Build case_usage rows (extract from remarks)
 # -----------------------------
+# remarks 分解用の正規表現（同上）
+# 区切り（半角/全角カンマ・読点）の直後、前後空白を除いて★で始まる要素だけを拾う
+_ITEM_SEGMENT_RE = re.compile(r"(?:^|[,\u3001，])\s*(★[^,\u3001，]*)")
+_USAGE_RE = re.compile(r"^★\s*(.*?)(?:\[(\d+(?:\.\d+)?)\])\s*([^\]]*)\s*$")
+_USAGE_FALLBACK_RE = re.compile(r"^★\s*(.*?)\s*$")
+
+
 def parse_usage_from_remarks(internal_case_id: int, remarks: Any):
     """
     例:
@@ -160,7 +296,8 @@ def parse_usage_from_remarks(internal_case_id: int, remarks: Any):
       ★洗浄[生理食塩水250ml][1]本
       ★クリップ[3]個
 
-    を抽出して case_usage 行にする
+    を抽出して case_usage 行にする。
+    行は INSERT の列順 (case_id, free_item_name, quantity, unit, memo) のタプルで返す
     """
     results = []
     if remarks is None or (isinstance(remarks, float) and pd.isna(remarks)):
@@ -168,19 +305,15 @@ def parse_usage_from_remarks(internal_case_id: int, remarks: Any):
 
     text = str(remarks)
 
-    # 半角/全角カンマ/読点区切り
-    parts = re.split(r"[,\u3001，]", text)
-
-    for p in parts:
-        p = p.strip()
-        if not p.startswith("★"):
-            continue
+    # 半角/全角カンマ/読点区切りの ★要素を1パスで走査（★以外の要素は分割・生成しない）
+    for seg in _ITEM_SEGMENT_RE.finditer(text):
+        p = seg.group(1).rstrip()
 
         memo = p
 
         # 末尾の [数値] + 単位 を quantity/unit として取得
         # 例: ★洗浄[生理食塩水250ml][1]本
-        m = re.match(r"^★\s*(.*?)(?:\[(\d+(?:\.\d+)?)\])\s*([^\]]*)\s*$", p)
+        m = _USAGE_RE.match(p)
         if m:
             left = (m.group(1) or "").strip()
             qty_str = m.group(2)
@@ -189,40 +322,131 @@ def parse_usage_from_remarks(internal_case_id: int, remarks: Any):
             # free_item_name は最初の [ の前
             item_name = left.split("[")[0].strip()
 
-            # DBはINTEGER想定なので、少数は四捨五入ではなく「文字→float→int」にせずそのまま保持したい場合はTEXTにする必要あり
-            # 今回は安全に「数値っぽいなら int / float を許す」が、INSERT時に str で入れる（SQLiteは許容）
+            # quantity 列は INTEGER（数値アフィニティ）なので int / float のまま渡す
+            # （小数も REAL として保持され、文字列化・再パースは不要）
             quantity: Any = float(qty_str) if "." in qty_str else int(qty_str)
 
             if item_name:
-                results.append(
-                    {
-                        "case_id": internal_case_id,
-                        "free_item_name": item_name,
-                        "quantity": quantity,
-                        "unit": unit,
-                        "memo": memo,
-                    }
-                )
+                results.append((internal_case_id, item_name, quantity, unit, memo))
             continue
 
         # フォールバック：数量が取れないが品目名だけは取る
-        m2 = re.match(r"^★\s*(.*?)\s*$", p)
+        m2 = _USAGE_FALLBACK_RE.match(p)
         if m2:
             item_name = (m2.group(1) or "").strip()
             if item_name:
-                results.append(
-                    {
-                        "case_id": internal_case_id,
-                        "free_item_name": item_name,
-                        "quantity": None,
-                        "unit": None,
-                        "memo": memo,
-                    }
-                )
+                results.append((internal_case_id, item_name, None, None, memo))
 
     return results
 
 
+# -----------------------------
+# CSV import: DB write
+# -----------------------------
+def write_cases_chunk(cur: sqlite3.Cursor, cases_df: pd.DataFrame) -> int:
+    """
+    build_surg_cases の結果1チャンク分を surg_cases に UPSERT し、
+    remarks から抽出した case_usage を作り直す。登録した usage 行数を返す。
+    トランザクションは呼び出し側で管理する。
+    """
+    ext_case_ids = cases_df["ext_case_id"].tolist()
+    if not ext_case_ids:
+        return 0
+
+    # executemany にそのまま渡せるよう NaN → None に揃える（リスト化せず1行ずつ流す）
+    case_cols = [
+        "patient_id",
+        "patient_name",
+        "surg_date",
+        "age",
+        "dept",
+        "surg_procedure",
+        "disease",
+        "ext_case_id",
+    ]
+    # 列ごとに object 配列へ1回変換して zip で行タプル化する（itertuples の行単位走査を避ける）
+    cases_records = zip(
+        *(cases_df[c].astype(object).where(cases_df[c].notna(), None).to_numpy() for c in case_cols)
+    )
+
+    # ext_case_id で UPSERT（内部case_idは維持）。再インポートで値が変わらない行は書き換えない
+    cur.executemany(
+        """
+        INSERT INTO surg_cases
+          (patient_id, patient_name, surg_date, age, dept, surg_procedure, disease, ext_case_id)
+        VALUES
+          (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ext_case_id) DO UPDATE SET
+          patient_id = excluded.patient_id,
+          patient_name = excluded.patient_name,
+          surg_date = excluded.surg_date,
+          age = excluded.age,
+          dept = excluded.dept,
+          surg_procedure = excluded.surg_procedure,
+          disease = excluded.disease
+        WHERE
+          (surg_cases.patient_id, surg_cases.patient_name, surg_cases.surg_date, surg_cases.age,
+           surg_cases.dept, surg_cases.surg_procedure, surg_cases.disease)
+          IS NOT
+          (excluded.patient_id, excluded.patient_name, excluded.surg_date, excluded.age,
+           excluded.dept, excluded.surg_procedure, excluded.disease)
+        """,
+        cases_records,
+    )
+
+    # IN (?, ?, ...) は件数がSQLiteの変数上限（古いSQLiteでは999）に当たるため、
+    # チャンクの ext_case_id を一時テーブルに入れて JOIN / サブクエリで引く
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS _import_ext_case_ids (ext_case_id TEXT PRIMARY KEY)")
+    cur.execute("DELETE FROM _import_ext_case_ids")
+    cur.executemany(
+        "INSERT OR IGNORE INTO _import_ext_case_ids (ext_case_id) VALUES (?)",
+        ((ext_case_id,) for ext_case_id in ext_case_ids),
+    )
+
+    # ext_case_id → 内部case_id の対応を一括取得
+    # 内部IDは rowid で引く（case_id が INTEGER PK なら同じ値。
+    # case_id が TEXT PK の既存DBでは case_id が NULL のままなので、従来の lastrowid と同じ rowid を使う）
+    cur.execute(
+        """
+        SELECT s.rowid AS internal_id, s.ext_case_id
+        FROM surg_cases AS s
+        JOIN _import_ext_case_ids AS t ON t.ext_case_id = s.ext_case_id
+        """
+    )
+    id_map = {r["ext_case_id"]: r["internal_id"] for r in cur.fetchall()}
+
+    # remarks から usage 抽出 → 該当case_idを作り直す（重複防止）
+    cur.execute(
+        """
+        DELETE FROM case_usage
+        WHERE case_id IN (
+          SELECT s.rowid
+          FROM surg_cases AS s
+          JOIN _import_ext_case_ids AS t ON t.ext_case_id = s.ext_case_id
+        )
+        """
+    )
+
+    # ★を含む remarks の行だけ抽出にかける（空欄・★なしの行は parse しない）
+    has_usage = cases_df["remarks"].str.contains("★", regex=False, na=False)
+    usage_src = cases_df.loc[has_usage, ["ext_case_id", "remarks"]]
+
+    usage_tuples = (
+        u
+        for ext_case_id, remarks in zip(usage_src["ext_case_id"], usage_src["remarks"])
+        for u in parse_usage_from_remarks(id_map[ext_case_id], remarks)
+    )
+    cur.executemany(
+        """
+        INSERT INTO case_usage (case_id, free_item_name, quantity, unit, memo)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        usage_tuples,
+    )
+    # executemany の rowcount は全行分の合計
+    return cur.rowcount
+
+
 # -----------------------------
 # API: CSV import
 # -----------------------------
@@ -236,106 +460,43 @@ def import_csv():
         return jsonify({"ok": False, "error": "CSVファイルを選択してください"}), 400
 
     try:
-        raw = f.read()
-        text = raw.decode("cp932")  # Shift_JIS系
-        df = pd.read_csv(io.StringIO(text), dtype=str)
-
-        df = normalize_headers(df)
-        validate_headers(df)
-
-        cases_df = build_surg_cases(df)
-
-        conn = get_conn()
-        cur = conn.cursor()
-
-        imported_cases = 0
-        imported_usage = 0
-
+        tmp_path = save_upload_to_tempfile(f)
         try:
-            cur.execute("BEGIN")
-
-            # ext_case_id で UPSERT（内部case_idは維持）
-            for _, row in cases_df.iterrows():
-                ext_case_id = row["ext_case_id"]
-
-                cur.execute("SELECT case_id FROM surg_cases WHERE ext_case_id = ?", (ext_case_id,))
-                found = cur.fetchone()
-
-                if found:
-                    internal_case_id = int(found["case_id"])
-                    cur.execute(
-                        """
-                        UPDATE surg_cases
-                        SET patient_id = ?,
-                            patient_name = ?,
-                            surg_date = ?,
-                            age = ?,
-                            dept = ?,
-                            surg_procedure = ?,
-                            disease = ?
-                        WHERE case_id = ?
-                        """,
-                        (
-                            row["patient_id"],
-                            row["patient_name"],
-                            row["surg_date"],
-                            row["age"],
-                            row["dept"],
-                            row["surg_procedure"],
-                            row["disease"],
-                            internal_case_id,
-                        ),
-                    )
-                else:
-                    cur.execute(
-                        """
-                        INSERT INTO surg_cases
-                          (patient_id, patient_name, surg_date, age, dept, surg_procedure, disease, ext_case_id)
-                        VALUES
-                          (?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            row["patient_id"],
-                            row["patient_name"],
-                            row["surg_date"],
-                            row["age"],
-                            row["dept"],
-                            row["surg_procedure"],
-                            row["disease"],
-                            ext_case_id,
-                        ),
-                    )
-                    internal_case_id = int(cur.lastrowid)
-
-                imported_cases += 1
-
-                # remarks から usage 抽出 → 該当case_idを作り直す（重複防止）
-                cur.execute("DELETE FROM case_usage WHERE case_id = ?", (internal_case_id,))
-                usage_rows = parse_usage_from_remarks(internal_case_id, row.get("remarks", ""))
-
-                for u in usage_rows:
-                    cur.execute(
-                        """
-                        INSERT INTO case_usage (case_id, free_item_name, quantity, unit, memo)
-                        VALUES (?, ?, ?, ?, ?)
-                        """,
-                        (
-                            u["case_id"],
-                            u["free_item_name"],
-                            str(u["quantity"]) if u["quantity"] is not None else None,
-                            u["unit"],
-                            u["memo"],
-                        ),
-                    )
-                imported_usage += len(usage_rows)
-
-            conn.commit()
-
-        except Exception:
-            conn.rollback()
-            raise
+            # ヘッダー検証はここで済ませ、DBに触る前に弾く
+            with open_required_csv(tmp_path) as reader:
+                # BEGIN IMMEDIATE / COMMIT / ROLLBACK を明示的に発行する（暗黙のトランザクション管理は使わない）
+                conn = open_conn(isolation_level=None)
+                apply_import_pragmas(conn)
+                cur = conn.cursor()
+
+                imported_cases = 0
+                imported_usage = 0
+                seen_ext_case_ids: set[str] = set()
+
+                try:
+                    # 全チャンクを1トランザクションで書き込む（チャンク間でcommitしない）
+                    cur.execute("BEGIN IMMEDIATE")
+
+                    for chunk in reader:
+                        cases_df = build_surg_cases(normalize_headers(chunk))
+
+                        # 同一ext_case_idがチャンクをまたいで複数あっても先頭採用
+                        cases_df = cases_df[~cases_df["ext_case_id"].isin(seen_ext_case_ids)]
+                        seen_ext_case_ids.update(cases_df["ext_case_id"])
+
+                        imported_cases += len(cases_df)
+                        imported_usage += write_cases_chunk(cur, cases_df)
+
+                    cur.execute("COMMIT")
+
+                except Exception:
+                    if conn.in_transaction:
+                        cur.execute("ROLLBACK")
+                    raise
+                finally:
+                    conn.close()
         finally:
-            conn.close()
+            os.unlink(tmp_path)
 
         return jsonify(
             {
@@ -359,9 +520,10 @@ def import_csv():
 # -----------------------------
 @app.get("/api/cases")
 def api_cases():
-    conn = get_conn()
     try:
+        conn = get_conn()
         cur = conn.cursor()
+        cur.row_factory = None  # sqlite3.Row を作らず素のタプルで受ける
         cur.execute(
             """
             SELECT
@@ -378,30 +540,66 @@ def api_cases():
             ORDER BY surg_date DESC, patient_id ASC
             """
         )
-        rows = [dict(r) for r in cur.fetchall()]
-        return jsonify({"ok": True, "cases": rows})
-    finally:
-        conn.close()
+        cols = [d[0] for d in cur.description]
+
+        # 先頭行だけはここで読む（読み取り開始時のエラーは下の except で JSON エラーとして返せる）
+        # ヘッダー送信後のストリーム途中のエラーは JSON にできず、レスポンスが途中で切れる
+        first = cur.fetchone()
+
+        # 全件を list / dict に溜めず、カーソルを回しながら1件ずつJSONにして返す
+        def to_json(r: tuple) -> str:
+            return app.json.dumps(dict(zip(cols, r)))
+
+        def generate():
+            yield '{"ok": true, "cases": ['
+            if first is not None:
+                yield to_json(first)
+                for r in cur:
+                    yield ","
+                    yield to_json(r)
+            yield "]}"
+
+        return Response(stream_with_context(generate()), mimetype="application/json")
+
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"一覧取得でエラー: {e}"}), 500
 
 
 @app.get("/api/cases/<int:case_id>/usage")
 def api_case_usage(case_id: int):
     conn = get_conn()
+    cur = conn.cursor()
+    cur.row_factory = None  # sqlite3.Row を作らず素のタプルで受ける
+    cur.execute(
+        """
+        SELECT usage_id, case_id, free_item_name, quantity, unit, memo
+        FROM case_usage
+        WHERE case_id = ?
+        ORDER BY usage_id ASC
+        """,
+        (case_id,),
+    )
+    cols = [d[0] for d in cur.description]
+    rows = [dict(zip(cols, r)) for r in cur]
+    return jsonify({"ok": True, "usage": rows})
+
+
+def to_quantity(value: Any) -> Any:
+    """
+    PUT で受け取った quantity を、インポートと同じく数値（int / float）で保存できる形にする。
+    数値として読めない文字列などは従来どおり文字列のまま保存する。
+    """
+    if value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+        return value
+    text = str(value).strip()
     try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT usage_id, case_id, free_item_name, quantity, unit, memo
-            FROM case_usage
-            WHERE case_id = ?
-            ORDER BY usage_id ASC
-            """,
-            (case_id,),
-        )
-        rows = [dict(r) for r in cur.fetchall()]
-        return jsonify({"ok": True, "usage": rows})
-    finally:
-        conn.close()
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
 
 
 @app.put("/api/cases/<int:case_id>/usage")
@@ -445,7 +643,7 @@ def api_case_usage_replace(case_id: int):
                 (
                     case_id,
                     name,
-                    str(qty) if qty is not None else None,
+                    to_quantity(qty),
                     unit,
                     memo,
                 ),
@@ -457,8 +655,6 @@ def api_case_usage_replace(case_id: int):
     except Exception as e:
         conn.rollback()
         return jsonify({"ok": False, "error": f"保存でエラー: {e}"}), 500
-    finally:
-        conn.close()
 
 
 @app.get("/api/health")
@@ -1,10 +1,16 @@
 from pathlib import Path
-import io
 import re
 import sqlite3
+import threading
 
 import pandas as pd
-from flask import Flask, send_from_directory, request, jsonify
+from flask import Flask, Response, send_from_directory, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson 未導入なら Flask 標準の json で返す
+    orjson = None
 
 # -----------------------------
 # パス設定
@@ -14,35 +20,144 @@ DB_PATH = BASE_DIR / "surgDB.db"
 
 app = Flask(__name__, static_folder=str(BASE_DIR), static_url_path="")
 
+# 静的ファイルはブラウザに1時間キャッシュさせる（Cache-Control: public, max-age=3600。期限後は ETag / Last-Modified で再検証）
+# static_folder の組み込みルートが /<path> を先に拾うので、その既定値も合わせておく。
+# 本番では BASE_DIR を nginx などの location / の root にして静的ファイルはそちらで配信し、
+# Flask には /api/ だけを回す想定（ここは開発用の配信）
+STATIC_MAX_AGE = 3600
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = STATIC_MAX_AGE
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    # jsonify / app.json.dumps を orjson（C実装）で処理する
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+if orjson is not None:
+    app.json = ORJSONProvider(app)
+
 
 # -----------------------------
 # 画面表示
 # -----------------------------
 @app.get("/")
 def index():
-    return send_from_directory(BASE_DIR, "index.html")
+    return send_from_directory(BASE_DIR, "index.html", max_age=STATIC_MAX_AGE)
 
 
 # （/cases.html, /app.js, /styles.css などを配信）
 @app.get("/<path:path>")
 def static_files(path):
-    return send_from_directory(BASE_DIR, path)
+    return send_from_directory(BASE_DIR, path, max_age=STATIC_MAX_AGE)
 
 
 # -----------------------------
 # DB接続
 # -----------------------------
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+_local = threading.local()
+
+
+def open_conn(isolation_level=""):
+    # isolation_level=None にすると sqlite3 モジュールの暗黙の BEGIN を使わず、トランザクションは自分で張る
+    conn = sqlite3.connect(DB_PATH, isolation_level=isolation_level)
     conn.row_factory = sqlite3.Row
+    # 接続ごとの設定（WAL前提で fsync を緩め、ページキャッシュ / 一時領域 / mmap を広げる）
+    conn.executescript("""
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-20000;
+        PRAGMA mmap_size=268435456;
+    """)
     return conn
 
 
+def get_conn():
+    """
+    スレッドごとに1本の接続を使い回す（リクエストごとの connect / PRAGMA を避ける）。
+    閉じずに返すので、呼び出し側で close() しないこと。
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = open_conn()
+        _local.conn = conn
+    return conn
+
+
+@app.teardown_appcontext
+def _rollback_conn(exc):
+    # 使い回す接続に未確定のトランザクションを残さない
+    conn = getattr(_local, "conn", None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def apply_import_pragmas(conn):
+    """
+    CSV一括インポート用の接続だけに適用する速度優先の設定。
+    synchronous=OFF のため、インポート中にOSクラッシュや電源断が起きると
+    直前のコミットが失われる可能性がある（アプリ例外時の ROLLBACK は従来どおり効く）。
+    CSVを再インポートすれば復旧できる前提で、インポートは open_conn() の専用接続で行い、
+    終わったら閉じて get_conn() の使い回し接続には持ち込まない。
+    journal_mode は WAL のまま（WAL中は他の接続があると切り替えられないため）。
+    """
+    conn.executescript(
+        """
+        PRAGMA synchronous=OFF;
+        PRAGMA cache_size=-65536;
+        """
+    )
+
+
 def table_columns(conn, table_name: str):
     rows = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
     return {r["name"] for r in rows}
 
 
+def init_db():
+    """
+    起動時に1回だけ行うDB設定。
+    - journal_mode=WAL（DBファイルに保存されるので接続ごとには不要）。書き込み中も読み取りがブロックされない
+    - 一覧APIの ORDER BY と同じ並びのIndex（全件ソートを避ける）
+    - case_usage.case_id のIndex（消耗品の取得・削除を全件走査にしない）
+      case_usage.case_id は TEXT 列で数値も文字列として保存されるので、クエリ側で CAST せずにIndexを使う
+    """
+    conn = open_conn()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_surg_cases_sort'")
+        if cur.fetchone() is None:
+            cur.execute("CREATE INDEX idx_surg_cases_sort ON surg_cases(surg_date DESC, patient_id ASC)")
+            cur.execute("ANALYZE surg_cases")
+
+        # case_usage は case_id 単位で取得・削除するので索引を張る
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_case_usage_case_id ON case_usage(case_id)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+init_db()
+
+
+# 実行中にスキーマは変わらないので、surg_cases の列構成は起動時に1回だけ調べておく
+# （マイグレーションを足すときはここも取り直すこと）
+_conn = open_conn()
+try:
+    SURG_CASES_COLUMNS = table_columns(_conn, "surg_cases")
+finally:
+    _conn.close()
+del _conn
+
+HAS_REMARKS = "remarks" in SURG_CASES_COLUMNS
+HAS_DELETED = "deleted" in SURG_CASES_COLUMNS
+
+
 # -----------------------------
 # ヘッダー定義（実CSVに合わせた）
 # -----------------------------
@@ -61,7 +176,7 @@ REQUIRED_COLUMNS = [
 
 def normalize_headers(df: pd.DataFrame) -> pd.DataFrame:
     # 全角空白→半角、前後空白除去
-    df.columns = [str(c).replace("\u3000", " ").strip() for c in df.columns]
+    df.columns = df.columns.astype(str).str.replace("\u3000", " ", regex=False).str.strip()
     return df
 
 
@@ -71,133 +186,152 @@ def validate_headers(df: pd.DataFrame):
         raise ValueError("必須列が不足しています: " + ", ".join(missing))
 
 
-def to_iso_date(val):
-    if pd.isna(val):
-        return None
-    s = str(val).strip()
-    if not s:
-        return None
-    dt = pd.to_datetime(s, errors="coerce")
-    if pd.isna(dt):
-        raise ValueError(f"手術実施日の形式が不正です: {s}")
-    return dt.strftime("%Y-%m-%d")
+def to_iso_date_series(s: pd.Series) -> pd.Series:
+    """
+    手術実施日を列まとめて YYYY-MM-DD に変換する（空欄は None）。
+    まず列全体で一括パースし、書式が混在していて取りこぼしたセルだけ1件ずつ再パースする。
+    解釈できない値があれば一覧にして ValueError を1回だけ出す。
+    """
+    text = s.fillna("").astype(str).str.strip()
+    filled = text.ne("")
+
+    dt = pd.to_datetime(text.where(filled), errors="coerce")
+
+    retry = dt.isna() & filled
+    if retry.any():
+        dt = dt.astype(object)
+        dt[retry] = text[retry].map(lambda v: pd.to_datetime(v, errors="coerce"))
+        dt = pd.to_datetime(dt)
+
+    bad = text[dt.isna() & filled]
+    if len(bad):
+        raise ValueError("手術実施日の形式が不正です: " + ", ".join(bad.unique()))
+
+    return dt.dt.strftime("%Y-%m-%d").astype(object).where(dt.notna(), None)
+
 
+# 数字列抽出用の正規表現（呼び出しごとのコンパイルを避けて1回だけ作る）
+_INT_RE = re.compile(r"(\d+)")
 
-def parse_int_safe(val):
-    if pd.isna(val):
-        return None
-    s = str(val).strip()
-    if s == "":
-        return None
-    m = re.search(r"\d+", s)
-    return int(m.group()) if m else None
+
+def parse_int_series(s: pd.Series) -> pd.Series:
+    # 各セルの最初の数字列を整数化（数字がなければ <NA>）
+    # \d は全角数字にもマッチするので int() で変換する（"３０歳" → 30。to_numeric は全角を受け付けない）
+    digits = s.fillna("").astype(str).str.extract(_INT_RE, expand=False).dropna()
+    return digits.map(int).astype("Int64").reindex(s.index)
 
 
 # -----------------------------
 # surg_cases 用整形
 # -----------------------------
-def build_surg_cases(df: pd.DataFrame) -> pd.DataFrame:
-    out = pd.DataFrame()
-    out["case_id"] = df["症例ID"].astype(str).str.strip()
-    out["patient_id"] = df["患者番号"].astype(str).str.strip()
-    out["patient_name"] = df["患者氏名(漢字)"].astype(str).str.strip()
-    out["surg_date"] = df["手術実施日"].apply(to_iso_date)
-    out["age"] = df["年齢"].apply(parse_int_safe)
-    out["dept"] = df["実施診療科"].astype(str).str.strip()
-    out["surg_procedure"] = df["確定術式フリー検索"].astype(str).str.strip()
-    out["disease"] = df["術後病名"].astype(str).str.strip()
-    out["remarks"] = df["リマークス（看護）"].astype(str).fillna("").str.strip()
+# CSV列 → surg_cases列（前後空白を落とすだけの文字列列）
+SURG_CASES_TEXT_COLUMNS = {
+    "症例ID": "case_id",
+    "患者番号": "patient_id",
+    "患者氏名(漢字)": "patient_name",
+    "実施診療科": "dept",
+    "確定術式フリー検索": "surg_procedure",
+    "術後病名": "disease",
+    "リマークス（看護）": "remarks",
+}
+
+
+def to_param_rows(frame: pd.DataFrame) -> list[tuple]:
+    """
+    DataFrame を executemany にそのまま渡せるタプルのリストにする（列順はそのまま）。
+    <NA> / NaN は sqlite3 に渡せないので None に揃える。
+    """
+    cols = [frame[c].astype(object).where(frame[c].notna(), None) for c in frame.columns]
+    return list(zip(*cols))
+
+
+def build_surg_cases(df: pd.DataFrame) -> list[tuple]:
+    """
+    surg_cases に UPSERT する行を
+      (case_id, patient_id, patient_name, surg_date, age, dept, surg_procedure, disease, remarks)
+    のタプルで返す（整形は列まとめで行い、DataFrame は返さない）。
+    """
+    # 文字列列はまとめて切り出して1回で strip（列ごとに中間Seriesを作らない）
+    out = (
+        df[list(SURG_CASES_TEXT_COLUMNS)]
+        .rename(columns=SURG_CASES_TEXT_COLUMNS)
+        .astype(str)
+        .apply(lambda s: s.str.strip())
+    )
+    out["remarks"] = out["remarks"].fillna("")
+    out.insert(3, "surg_date", to_iso_date_series(df["手術実施日"]))
+    out.insert(4, "age", parse_int_series(df["年齢"]))
 
     # 空のcase_id除外
     out = out[out["case_id"] != ""].copy()
 
     # 同一症例IDが複数あれば先頭を採用
     out = out.drop_duplicates(subset=["case_id"], keep="first")
-    return out
+    return to_param_rows(out)
 
 
 # -----------------------------
 # case_usage 用整形（Rロジック寄せ）
 # -----------------------------
-def parse_usage_from_remarks(case_id: str, remarks: str):
+# remarks 分解用の正規表現（同上）
+# 区切り（半角/全角カンマ・読点）の直後、前後空白を除いて★で始まる要素だけを拾う
+_ITEM_SEGMENT_RE = re.compile(r"(?:^|[,\u3001，])\s*(★[^,\u3001，]*)")
+_USAGE_RE = re.compile(r"^★\s*(.*?)(?:\[(\d+(?:\.\d+)?)\])\s*([^\]]*)\s*$")
+_USAGE_FALLBACK_RE = re.compile(r"^★\s*(.*?)\s*$")
+
+
+def build_case_usage(df: pd.DataFrame) -> list[tuple]:
     """
-    例:
+    remarks 列から
       ★サージセル[2]枚
       ★洗浄[生理食塩水250ml][1]本
       ★クリップ[3]個
-    を抽出して case_usage 行にする
+    を抽出して case_usage 行 (case_id, free_item_name, quantity, unit, memo) のタプルにする。
+    行ごとのループではなく、★要素を列まとめて分解（findall → explode）し、
+    品目名 / 数量 / 単位を .str.extract で一括抽出する。
     """
-    results = []
-
-    if remarks is None or (isinstance(remarks, float) and pd.isna(remarks)):
-        return results
-
-    text = str(remarks)
-
-    # 半角/全角カンマ/読点区切り
-    parts = re.split(r"[,\u3001，]", text)
-
-    for p in parts:
-        p = p.strip()
-        if not p.startswith("★"):
-            continue
-
-        memo = p
-
-        # 末尾の [数値] + 単位 を quantity/unit として取得
-        # 例: ★洗浄[生理食塩水250ml][1]本
-        m = re.match(r"^★\s*(.*?)(?:\[(\d+(?:\.\d+)?)\])\s*([^\]]*)\s*$", p)
-        if m:
-            left = (m.group(1) or "").strip()
-            qty_str = m.group(2)
-            unit = (m.group(3) or "").strip() or None
-
-            # free_item_name は最初の [ の前を使う（Rコード寄せ）
-            item_name = left.split("[")[0].strip()
-
-            quantity = float(qty_str) if "." in qty_str else int(qty_str)
-
-            if item_name:
-                results.append({
-                    "case_id": case_id,
-                    "free_item_name": item_name,
-                    "quantity": quantity,
-                    "unit": unit,
-                    "memo": memo,
-                })
-            continue
-
-        # フォールバック（[]がない/崩れている）
-        m2 = re.match(r"^★\s*(.*?)\s*$", p)
-        if m2:
-            item_name = (m2.group(1) or "").strip()
-            if item_name:
-                results.append({
-                    "case_id": case_id,
-                    "free_item_name": item_name,
-                    "quantity": None,
-                    "unit": None,
-                    "memo": memo,
-                })
-
-    return results
-
-
-def build_case_usage(df: pd.DataFrame) -> pd.DataFrame:
-    rows = []
-    for _, r in df.iterrows():
-        case_id = str(r["症例ID"]).strip()
-        if not case_id:
-            continue
-        rows.extend(parse_usage_from_remarks(case_id, r.get("リマークス（看護）", "")))
-
-    out = pd.DataFrame(rows, columns=["case_id", "free_item_name", "quantity", "unit", "memo"])
-    if len(out) == 0:
-        return out
+    columns = ["case_id", "free_item_name", "quantity", "unit", "memo"]
+
+    # ★を含む remarks の行だけ抽出にかける（空欄・★なしの行は parse しない）
+    has_usage = df["リマークス（看護）"].str.contains("★", regex=False, na=False)
+    src = df.loc[has_usage, ["症例ID", "リマークス（看護）"]]
+
+    case_ids = src["症例ID"].fillna("").astype(str).str.strip()
+    src = src[case_ids != ""]
+    case_ids = case_ids[case_ids != ""]
+
+    # 半角/全角カンマ/読点区切りの ★要素を1行1要素に展開（index は元の行のまま）
+    memo = src["リマークス（看護）"].astype(str).str.findall(_ITEM_SEGMENT_RE).explode().dropna().str.rstrip()
+    if len(memo) == 0:
+        return []
+
+    # 末尾の [数値] + 単位 を quantity/unit として取得
+    # 例: ★洗浄[生理食塩水250ml][1]本
+    m = memo.str.extract(_USAGE_RE)
+    matched = m[1].notna()
+
+    # free_item_name は最初の [ の前を使う（Rコード寄せ）
+    name = m[0].fillna("").str.strip().str.split("[", n=1).str[0].str.strip()
+    unit = m[2].fillna("").str.strip()
+
+    # フォールバック（[]がない/崩れている）: ★以降をそのまま品目名にする
+    fallback_name = memo.str.extract(_USAGE_FALLBACK_RE, expand=False).fillna("").str.strip()
+
+    out = pd.DataFrame({
+        "case_id": case_ids.reindex(memo.index),
+        "free_item_name": name.where(matched, fallback_name),
+        "quantity": pd.to_numeric(m[1]),
+        "unit": unit.where(matched & unit.ne(""), None),
+        "memo": memo,
+    }, columns=columns)
+    out = out[out["free_item_name"] != ""].reset_index(drop=True)
 
     # 完全重複を除外
     out = out.drop_duplicates(subset=["case_id", "free_item_name", "memo"], keep="first")
-    return out
+
+    # quantity は列まとめて文字列化（欠損は None）
+    out["quantity"] = out["quantity"].astype("string")
+    return to_param_rows(out)
 
 
 # -----------------------------
@@ -214,98 +348,77 @@ def import_csv():
 
     try:
         # Shift_JIS（Windows系CSVは cp932）
-        raw = f.read()
-        text = raw.decode("cp932")
-        df = pd.read_csv(io.StringIO(text), dtype=str)
+        # アップロードのストリームをCエンジンで直接デコードしながら読む（bytes / str の全文コピーを作らない）
+        df = pd.read_csv(f.stream, encoding="cp932", dtype=str, engine="c")
 
         df = normalize_headers(df)
         validate_headers(df)
 
-        surg_cases_df = build_surg_cases(df)
-        case_usage_df = build_case_usage(df)
+        case_rows = build_surg_cases(df)
+        usage_rows = build_case_usage(df)
 
-        conn = get_conn()
+        # 速度優先の設定を使い回し接続に持ち込まないよう、インポートは専用の接続で行う
+        # BEGIN IMMEDIATE / COMMIT / ROLLBACK は明示的に発行する（暗黙のトランザクション管理は使わない）
+        conn = open_conn(isolation_level=None)
+        apply_import_pragmas(conn)
         cur = conn.cursor()
 
         try:
-            cur.execute("BEGIN")
-
-            cols = table_columns(conn, "surg_cases")
-            has_remarks = "remarks" in cols
-
-            # surg_cases: case_id で UPSERT
-            for _, row in surg_cases_df.iterrows():
-                if has_remarks:
-                    cur.execute("""
-                        INSERT INTO surg_cases
-                        (case_id, patient_id, patient_name, surg_date, age, dept, surg_procedure, disease, remarks)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(case_id) DO UPDATE SET
-                            patient_id=excluded.patient_id,
-                            patient_name=excluded.patient_name,
-                            surg_date=excluded.surg_date,
-                            age=excluded.age,
-                            dept=excluded.dept,
-                            surg_procedure=excluded.surg_procedure,
-                            disease=excluded.disease,
-                            remarks=excluded.remarks
-                    """, (
-                        row["case_id"],
-                        row["patient_id"],
-                        row["patient_name"],
-                        row["surg_date"],
-                        row["age"],
-                        row["dept"],
-                        row["surg_procedure"],
-                        row["disease"],
-                        row["remarks"],
-                    ))
-                else:
-                    cur.execute("""
-                        INSERT INTO surg_cases
-                        (case_id, patient_id, patient_name, surg_date, age, dept, surg_procedure, disease)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT(case_id) DO UPDATE SET
-                            patient_id=excluded.patient_id,
-                            patient_name=excluded.patient_name,
-                            surg_date=excluded.surg_date,
-                            age=excluded.age,
-                            dept=excluded.dept,
-                            surg_procedure=excluded.surg_procedure,
-                            disease=excluded.disease
-                    """, (
-                        row["case_id"],
-                        row["patient_id"],
-                        row["patient_name"],
-                        row["surg_date"],
-                        row["age"],
-                        row["dept"],
-                        row["surg_procedure"],
-                        row["disease"],
-                    ))
+            cur.execute("BEGIN IMMEDIATE")
+
+            # surg_cases: case_id で UPSERT（1文を使い回して一括実行）
+            if HAS_REMARKS:
+                upsert_sql = """
+                    INSERT INTO surg_cases
+                    (case_id, patient_id, patient_name, surg_date, age, dept, surg_procedure, disease, remarks)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(case_id) DO UPDATE SET
+                        patient_id=excluded.patient_id,
+                        patient_name=excluded.patient_name,
+                        surg_date=excluded.surg_date,
+                        age=excluded.age,
+                        dept=excluded.dept,
+                        surg_procedure=excluded.surg_procedure,
+                        disease=excluded.disease,
+                        remarks=excluded.remarks
+                """
+            else:
+                upsert_sql = """
+                    INSERT INTO surg_cases
+                    (case_id, patient_id, patient_name, surg_date, age, dept, surg_procedure, disease)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(case_id) DO UPDATE SET
+                        patient_id=excluded.patient_id,
+                        patient_name=excluded.patient_name,
+                        surg_date=excluded.surg_date,
+                        age=excluded.age,
+                        dept=excluded.dept,
+                        surg_procedure=excluded.surg_procedure,
+                        disease=excluded.disease
+                """
+            # remarks 列がないDBでは末尾の remarks を落として渡す
+            cur.executemany(upsert_sql, case_rows if HAS_REMARKS else (r[:-1] for r in case_rows))
 
             # case_usage: 対象case_idを一旦削除して再登録（重複防止）
-            target_case_ids = surg_cases_df["case_id"].astype(str).tolist()
-            if target_case_ids:
-                placeholders = ",".join(["?"] * len(target_case_ids))
-                cur.execute(f"DELETE FROM case_usage WHERE case_id IN ({placeholders})", target_case_ids)
-
-            for _, row in case_usage_df.iterrows():
-                cur.execute("""
-                    INSERT INTO case_usage (case_id, free_item_name, quantity, unit, memo)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    row["case_id"],
-                    row["free_item_name"],
-                    str(row["quantity"]) if pd.notna(row["quantity"]) else None,
-                    row["unit"],
-                    row["memo"],
-                ))
+            # IN (?, ?, ...) は件数がSQLiteの変数上限に当たるため、一時テーブルに入れてから消す
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS _import_case_ids (id TEXT PRIMARY KEY)")
+            cur.execute("DELETE FROM _import_case_ids")
+            cur.executemany(
+                "INSERT OR IGNORE INTO _import_case_ids (id) VALUES (?)",
+                ((r[0],) for r in case_rows),
+            )
+            cur.execute("DELETE FROM case_usage WHERE case_id IN (SELECT id FROM _import_case_ids)")
+
+            cur.executemany("""
+                INSERT INTO case_usage (case_id, free_item_name, quantity, unit, memo)
+                VALUES (?, ?, ?, ?, ?)
+            """, usage_rows)
 
-            conn.commit()
+            cur.execute("COMMIT")
 
         except Exception:
-            conn.rollback()
+            if conn.in_transaction:
+                cur.execute("ROLLBACK")
             raise
         finally:
             conn.close()
@@ -313,8 +426,8 @@ def import_csv():
         return jsonify({
             "ok": True,
             "message": "CSVインポート完了",
-            "imported_cases": int(len(surg_cases_df)),
-            "imported_usage_rows": int(len(case_usage_df)),
+            "imported_cases": len(case_rows),
+            "imported_usage_rows": len(usage_rows),
         })
 
     except UnicodeDecodeError:
@@ -332,10 +445,6 @@ def import_csv():
 def api_cases():
     try:
         conn = get_conn()
-        cols = table_columns(conn, "surg_cases")
-
-        has_remarks = "remarks" in cols
-        has_deleted = "deleted" in cols
 
         # 列がない環境でも落ちないように SELECT を組み立てる
         select_sql = f"""
@@ -348,30 +457,35 @@ def api_cases():
               dept,
               disease,
               surg_procedure,
-              {"COALESCE(remarks, '') AS remarks" if has_remarks else "'' AS remarks"},
-              {"COALESCE(deleted, 0) AS deleted" if has_deleted else "0 AS deleted"}
+              {"COALESCE(remarks, '') AS remarks" if HAS_REMARKS else "'' AS remarks"},
+              {"COALESCE(deleted, 0) AS deleted" if HAS_DELETED else "0 AS deleted"}
             FROM surg_cases
             ORDER BY surg_date DESC, patient_id ASC
         """
-        rows = conn.execute(select_sql).fetchall()
-        conn.close()
-
-        cases = []
-        for r in rows:
-            cases.append({
-                "case_id": r["case_id"],
-                "patient_id": r["patient_id"],
-                "patient_name": r["patient_name"],
-                "surg_date": r["surg_date"],
-                "age": r["age"],
-                "dept": r["dept"],
-                "disease": r["disease"],
-                "surg_procedure": r["surg_procedure"],
-                "remarks": r["remarks"],
-                "deleted": bool(r["deleted"]),
-            })
-
-        return jsonify({"ok": True, "cases": cases})
+        cur = conn.cursor()
+        cur.row_factory = None  # sqlite3.Row を作らず素のタプルで受ける
+        cur.execute(select_sql)
+        cols = [d[0] for d in cur.description]
+
+        # 先頭行だけはここで読む（読み取り開始時のエラーは下の except で JSON エラーとして返せる）
+        # ヘッダー送信後のストリーム途中のエラーは JSON にできず、レスポンスが途中で切れる
+        first = cur.fetchone()
+
+        # 全件を list / dict に溜めず、カーソルを回しながら1件ずつJSONにして返す
+        # SELECT の列名がそのままキーになる（末尾の deleted だけ bool に寄せる）
+        def to_json(r):
+            return app.json.dumps({**dict(zip(cols, r)), "deleted": bool(r[-1])})
+
+        def generate():
+            yield '{"ok": true, "cases": ['
+            if first is not None:
+                yield to_json(first)
+                for r in cur:
+                    yield ","
+                    yield to_json(r)
+            yield "]}"
+
+        return Response(stream_with_context(generate()), mimetype="application/json")
 
     except Exception as e:
         return jsonify({"ok": False, "error": f"/api/cases エラー: {e}"}), 500
@@ -396,10 +510,9 @@ def api_case_usage_get():
               COALESCE(unit, '') AS unit,
               COALESCE(memo, '') AS memo
             FROM case_usage
-            WHERE CAST(case_id AS TEXT) = ?
+            WHERE case_id = ?
             ORDER BY rowid
         """, (str(case_id),)).fetchall()
-        conn.close()
 
         out = []
         for r in rows:
@@ -432,13 +545,8 @@ def api_case_usage_post():
         if not isinstance(rows, list):
             return jsonify({"ok": False, "error": "rows must be a list"}), 400
 
-        conn = get_conn()
-        cur = conn.cursor()
-
-        # その症例の既存行を削除
-        cur.execute("DELETE FROM case_usage WHERE CAST(case_id AS TEXT) = ?", (str(case_id),))
-
-        # 再登録
+        # 先に入力を検証・整形して、INSERT のパラメータをまとめて作る
+        params = []
         for x in rows:
             free_item_name = str(x.get("free_item_name", "")).strip()
             if not free_item_name:
@@ -454,13 +562,29 @@ def api_case_usage_post():
             unit = str(x.get("unit", "")).strip()
             memo = str(x.get("memo", "")).strip()
 
-            cur.execute("""
+            params.append((str(case_id), free_item_name, quantity, unit, memo))
+
+        conn = get_conn()
+        cur = conn.cursor()
+
+        try:
+            # 削除と再登録を1トランザクションで（途中で失敗したら元に戻す）
+            cur.execute("BEGIN")
+
+            # その症例の既存行を削除
+            cur.execute("DELETE FROM case_usage WHERE case_id = ?", (str(case_id),))
+
+            # 再登録
+            cur.executemany("""
                 INSERT INTO case_usage (case_id, free_item_name, quantity, unit, memo)
                 VALUES (?, ?, ?, ?, ?)
-            """, (str(case_id), free_item_name, quantity, unit, memo))
+            """, params)
 
-        conn.commit()
-        conn.close()
+            conn.commit()
+
+        except Exception:
+            conn.rollback()
+            raise
 
         return jsonify({"ok": True, "message": "saved"})
 